@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AiAssistantConfig(AppConfig):
     name = 'ai_assistant'
+
+    def ready(self):
+        from . import signals  # noqa: F401
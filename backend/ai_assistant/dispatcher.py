@@ -1,6 +1,8 @@
 from tasks.services import TaskService
 from tasks.models import Task
 from django.core.exceptions import ValidationError
+from core.db_router import read_from_replica
+from .task_index import task_index
 
 class IntentDispatcher:
     @staticmethod
@@ -46,9 +48,9 @@ class IntentDispatcher:
                         result["message"] = str(e)
 
             elif action == 'update_task_status':
-                task = IntentDispatcher._find_task(params)
+                task, not_found = IntentDispatcher._find_task(params)
                 if not task:
-                    result["message"] = "Task not found."
+                    result["message"] = not_found
                 else:
                     new_status = params.get('status')
                     try:
@@ -64,16 +66,18 @@ class IntentDispatcher:
                 tasks = Task.objects.all()
                 if status_filter:
                     tasks = tasks.filter(status=status_filter)
-                task_list = [{"id": t.id, "title": t.title, "status": t.status} for t in tasks[:5]]
+                with read_from_replica():
+                    task_list = [{"id": t.id, "title": t.title, "status": t.status} for t in tasks[:5]]
+                    total = tasks.count()
                 result["success"] = True
-                result["message"] = f"Found {tasks.count()} tasks."
+                result["message"] = f"Found {total} tasks."
                 result["tasks"] = task_list
                 success_count += 1
 
             elif action == 'delete_task':
-                task = IntentDispatcher._find_task(params)
+                task, not_found = IntentDispatcher._find_task(params)
                 if not task:
-                    result["message"] = "Task not found."
+                    result["message"] = not_found
                 else:
                     title = task.title
                     task.delete()
@@ -98,19 +102,44 @@ class IntentDispatcher:
 
     @staticmethod
     def _find_task(params):
+        """
+        Resolves a task from an explicit id or an LLM-extracted title.
+        Returns (task, message); message explains why task is None.
+        """
         task_id = params.get('task_id')
         title = params.get('title')
         
         if task_id:
             try:
-                return Task.objects.get(id=task_id)
+                return Task.objects.get(id=task_id), None
             except Task.DoesNotExist:
-                return None
+                return None, "Task not found."
         
         if title:
-            # Fuzzy match or exact? Using icontains for better UX
-            tasks = Task.objects.filter(title__icontains=title)
-            if tasks.exists():
-                return tasks.first() # Return first match
+            if not task_index.is_loaded:
+                # The index is still loading in the background. Only accept
+                # a substring match when it is unambiguous.
+                task_index.warm()
+                matches = list(Task.objects.filter(title__icontains=title)[:2])
+                if len(matches) == 1:
+                    return matches[0], None
+                return None, "Task not found."
+
+            for _ in range(2):
+                resolution = task_index.resolve(title)
+                if resolution.ambiguous:
+                    options = ", ".join(f"'{t}' (#{i})" for i, t, _ in resolution.candidates[:3])
+                    return None, f"'{title}' matches several tasks: {options}. Please be more specific."
+                if resolution.task_id is None:
+                    break
+                task = Task.objects.filter(id=resolution.task_id).first()
+                if task and task.title == resolution.candidates[0][1]:
+                    return task, None
+                # Renamed or deleted by another process since the index last
+                # saw it; resync that row and resolve again
+                if task:
+                    task_index.upsert(task.id, task.title)
+                else:
+                    task_index.remove(resolution.task_id)
         
-        return None
+        return None, "Task not found."
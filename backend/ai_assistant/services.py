@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from groq import Groq
 import json
 from django.conf import settings
@@ -111,3 +112,28 @@ Remember: ONLY output valid JSON, nothing else."""
         except Exception as e:
             print(f"Groq Error: {e}")
             return {"action": "error", "message": str(e)}
+
+    @classmethod
+    def interpret_commands(cls, commands: list, max_workers: int = None, on_result=None) -> list:
+        """
+        Interprets many commands concurrently, at most max_workers in flight.
+
+        Args:
+            commands: Natural language commands
+            max_workers: Concurrency limit, defaults to settings.AI_BATCH_CONCURRENCY
+            on_result: Optional callback run in the calling thread after each result
+
+        Returns:
+            list: One intent per command, in the same order
+        """
+        max_workers = max_workers or settings.AI_BATCH_CONCURRENCY
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            intents = []
+            for intent in executor.map(cls.interpret_command, commands):
+                intents.append(intent)
+                if on_result:
+                    on_result()
+            return intents
+        finally:
+            executor.shutdown(cancel_futures=True)
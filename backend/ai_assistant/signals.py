@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from tasks.models import Task
+from .task_index import task_index
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    task_id, title = instance.id, instance.title
+    transaction.on_commit(lambda: task_index.upsert(task_id, title))
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    task_id = instance.id
+    transaction.on_commit(lambda: task_index.remove(task_id))
@@ -0,0 +1,357 @@
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+
+# Filler words the LLM tends to leave in extracted titles ("the meeting one").
+STOPWORDS = {'a', 'an', 'the', 'one', 'task', 'about', 'my', 'that', 'this'}
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text: str) -> list:
+    return WORD_RE.findall((text or '').lower())
+
+
+def trigrams(words) -> set:
+    grams = set()
+    for word in words:
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class Resolution:
+    task_id: int = None
+    score: float = 0.0
+    ambiguous: bool = False
+    candidates: list = field(default_factory=list)  # [(task_id, title, score)]
+
+
+class TaskTitleIndex:
+    """
+    In-memory character-trigram TF-IDF index over task titles.
+
+    Rows live in NumPy arrays (ids, liveness, norms) and each trigram keeps a
+    growable postings array of row numbers. Lookups gather candidates from
+    the query's rarer trigrams only; trigrams found in more than
+    COMMON_RATIO of titles ("ing", "ent") are scored for those candidates
+    through a per-trigram boolean column instead of scanning their long
+    postings. Updates are incremental: changing a title retires the old row
+    and appends a new one.
+
+    Loading from the database happens in a background thread, never inside a
+    lookup; until it finishes, lookups return nothing. Each process keeps its
+    own index and only sees its own saves and deletes, so the index is also
+    reloaded every max_age seconds to pick up other workers' changes.
+    """
+
+    THRESHOLD = 0.4  # Minimum cosine score to accept a match
+    AMBIGUITY_RATIO = 0.85  # Runner-up scoring this close to the best is ambiguous
+    COMMON_RATIO = 0.02  # Trigrams in more titles than this don't generate candidates
+
+    # Attributes holding index contents, swapped in wholesale after a load
+    _STATE = (
+        '_ids', '_alive', '_norms', '_titles', '_row_grams', '_row_of',
+        '_postings', '_posting_len', '_columns', '_df', '_n_rows', '_n_alive', '_norms_at',
+    )
+
+    def __init__(self, loader=None, max_age=None):
+        self._loader = loader
+        self._max_age = max_age
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._warming = False
+        self._pending = []  # Updates received while a load is running
+        self._generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._ids = np.zeros(64, dtype=np.int64)
+        self._alive = np.zeros(64, dtype=bool)
+        self._norms = np.ones(64, dtype=np.float32)
+        self._titles = []
+        self._row_grams = []
+        self._row_of = {}
+        self._postings = {}  # gram -> int32 row array, filled up to _posting_len
+        self._posting_len = {}
+        self._columns = {}  # gram -> bool array over rows, built for common grams
+        self._df = {}
+        self._n_rows = 0
+        self._n_alive = 0
+        self._norms_at = 0  # Size when norms were last recomputed
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    # --- Maintenance ---
+
+    def reset(self):
+        """Drops all entries; the next lookup starts a reload."""
+        with self._lock:
+            self._clear()
+            self._loaded = False
+            self._warming = False
+            self._pending = []
+            self._generation += 1  # Discard any load still running
+
+    def rebuild(self, items):
+        """Replaces the index contents with (task_id, title) pairs."""
+        with self._lock:
+            self._clear()
+            for task_id, title in items:
+                self._add(task_id, title, with_norm=False)
+            self._refresh_norms()
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+
+    def warm(self, background=True):
+        """Loads the index from the loader, in a background thread by default."""
+        with self._lock:
+            if self._warming or self._loader is None:
+                return
+            self._warming = True
+            self._pending = []
+            generation = self._generation
+        if background:
+            threading.Thread(target=self._warm_thread, args=(generation,), daemon=True).start()
+        else:
+            self._warm(generation)
+
+    def _warm_thread(self, generation):
+        from django.db import connections
+        try:
+            self._warm(generation)
+        finally:
+            connections.close_all()  # Only closes this thread's connections
+
+    def _warm(self, generation):
+        try:
+            fresh = TaskTitleIndex()
+            fresh.rebuild(self._loader())
+        except Exception as e:
+            print(f"Task index load failed: {e}")
+            with self._lock:
+                if generation == self._generation:
+                    self._warming = False
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            for name in self._STATE:
+                setattr(self, name, getattr(fresh, name))
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+            self._warming = False
+            pending, self._pending = self._pending, []
+            for op, args in pending:
+                op(*args)
+
+    def upsert(self, task_id: int, title: str):
+        with self._lock:
+            if self._warming:
+                self._pending.append((self._upsert, (task_id, title)))
+            if self._loaded:
+                self._upsert(task_id, title)
+
+    def remove(self, task_id: int):
+        with self._lock:
+            if self._warming:
+                self._pending.append((self._remove_row, (task_id,)))
+            if self._loaded:
+                self._remove_row(task_id)
+
+    def _upsert(self, task_id, title):
+        row = self._row_of.get(task_id)
+        if row is not None and self._titles[row] == title:
+            return
+        self._remove(task_id)
+        self._add(task_id, title)
+        self._maybe_refresh()
+
+    def _remove_row(self, task_id):
+        self._remove(task_id)
+        self._maybe_refresh()
+
+    def _add(self, task_id, title, with_norm=True):
+        row = self._n_rows
+        if row == len(self._ids):
+            self._grow()
+        grams = tuple(trigrams(normalize(title)))
+        self._ids[row] = task_id
+        self._alive[row] = True
+        self._titles.append(title)
+        self._row_grams.append(grams)
+        for gram in grams:
+            self._append_posting(gram, row)
+            column = self._columns.get(gram)
+            if column is not None:
+                column[row] = True
+            self._df[gram] = self._df.get(gram, 0) + 1
+        self._row_of[task_id] = row
+        self._n_rows += 1
+        self._n_alive += 1
+        if with_norm:
+            self._norms[row] = self._norm(grams)
+
+    def _remove(self, task_id):
+        row = self._row_of.pop(task_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._n_alive -= 1
+        for gram in self._row_grams[row]:
+            self._df[gram] -= 1
+
+    def _grow(self):
+        size = len(self._ids) * 2
+        self._ids = np.resize(self._ids, size)
+        self._alive = np.concatenate([self._alive, np.zeros(size - len(self._alive), dtype=bool)])
+        self._norms = np.resize(self._norms, size)
+        for gram, column in self._columns.items():
+            self._columns[gram] = np.concatenate([column, np.zeros(size - len(column), dtype=bool)])
+
+    def _append_posting(self, gram, row):
+        postings = self._postings.get(gram)
+        length = self._posting_len.get(gram, 0)
+        if postings is None:
+            postings = self._postings[gram] = np.empty(4, dtype=np.int32)
+        elif length == len(postings):
+            postings = self._postings[gram] = np.resize(postings, length * 2)
+        postings[length] = row
+        self._posting_len[gram] = length + 1
+
+    def _posting_array(self, gram):
+        return self._postings[gram][:self._posting_len[gram]]
+
+    def _column(self, gram):
+        """Boolean row membership for a common gram, kept current by _add."""
+        column = self._columns.get(gram)
+        if column is None:
+            column = np.zeros(len(self._ids), dtype=bool)
+            column[self._posting_array(gram)] = True
+            self._columns[gram] = column
+        return column
+
+    def _maybe_refresh(self):
+        # IDF drifts as tasks come and go. Recompute row norms once the live
+        # count has moved by a quarter, and compact away retired rows once
+        # they outnumber live ones.
+        if self._n_rows > 2 * max(self._n_alive, 32):
+            live = [(int(self._ids[r]), self._titles[r]) for r in self._row_of.values()]
+            self._clear()
+            for task_id, title in live:
+                self._add(task_id, title, with_norm=False)
+            self._refresh_norms()
+        elif abs(self._n_alive - self._norms_at) > max(self._norms_at // 4, 16):
+            self._refresh_norms()
+
+    def _refresh_norms(self):
+        idf_sq = {gram: self._idf(gram) ** 2 for gram, df in self._df.items() if df}
+        for row in self._row_of.values():
+            self._norms[row] = math.sqrt(sum(idf_sq[g] for g in self._row_grams[row])) or 1.0
+        self._norms_at = self._n_alive
+
+    def _idf(self, gram):
+        return math.log((1 + self._n_alive) / (1 + self._df.get(gram, 0))) + 1.0
+
+    def _norm(self, grams):
+        return math.sqrt(sum(self._idf(g) ** 2 for g in grams)) or 1.0
+
+    def _ensure_loaded(self):
+        """Starts a background load if the index is missing or too old."""
+        stale = self._max_age is not None and time.monotonic() - self._loaded_at > self._max_age
+        if not self._loaded or stale:
+            self.warm()
+        return self._loaded
+
+    # --- Lookup ---
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Returns up to k (task_id, title, score) tuples, best first."""
+        words = normalize(query)
+        grams = trigrams([w for w in words if w not in STOPWORDS] or words)
+        with self._lock:
+            if not self._ensure_loaded() or not grams or not self._n_alive:
+                return []
+
+            # Every query trigram counts towards the query norm, including
+            # ones no title contains; otherwise a half-known query ("buy
+            # bread") scores as if it were only the known half ("buy").
+            weights = {gram: self._idf(gram) ** 2 for gram in grams}
+            query_norm = sum(weights.values())
+            known = sorted((g for g in grams if self._df.get(g)), key=self._df.get)
+            if not known:
+                return []
+            limit = self.COMMON_RATIO * self._n_alive
+            rare = [g for g in known if self._df[g] <= limit] or known[:1]
+            common = known[len(rare):]
+
+            # Candidates are the rows sharing a rare trigram with the query.
+            # A title sharing only common trigrams cannot reach THRESHOLD.
+            if len(rare) == 1:
+                # Postings are sorted and unique, so they are the candidates
+                candidates = self._posting_array(rare[0])
+                cand_scores = np.full(len(candidates), weights[rare[0]], dtype=np.float32)
+            else:
+                scores = np.zeros(self._n_rows, dtype=np.float32)
+                postings = []
+                for gram in rare:
+                    posting = self._posting_array(gram)
+                    scores[posting] += weights[gram]  # Rows are unique within a posting
+                    postings.append(posting)
+                # Sorting the gathered rows is much cheaper than scanning all
+                # scores for non-zeros.
+                rows = np.sort(np.concatenate(postings))
+                candidates = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+                cand_scores = scores[candidates]
+            alive = self._alive[candidates]
+            candidates, cand_scores = candidates[alive], cand_scores[alive]
+            if not len(candidates):
+                return []
+            for gram in common:
+                cand_scores += weights[gram] * self._column(gram)[candidates]
+            cand_scores /= self._norms[candidates] * math.sqrt(query_norm)
+            if len(candidates) > k:
+                top = np.argpartition(-cand_scores, k)[:k]
+                candidates, cand_scores = candidates[top], cand_scores[top]
+            order = np.argsort(-cand_scores, kind='stable')
+            return [
+                (int(self._ids[r]), self._titles[r], min(float(s), 1.0))
+                for r, s in zip(candidates[order], cand_scores[order])
+            ]
+
+    def resolve(self, query: str, k: int = 5) -> Resolution:
+        """
+        Picks the best matching task for an LLM-extracted title.
+
+        A match needs a score of at least THRESHOLD. If the runner-up scores
+        at least AMBIGUITY_RATIO of the best, the result is flagged ambiguous
+        instead of guessing.
+        """
+        candidates = [c for c in self.search(query, k) if c[2] >= self.THRESHOLD]
+        if not candidates:
+            return Resolution()
+        best = candidates[0]
+        ambiguous = len(candidates) > 1 and candidates[1][2] >= best[2] * self.AMBIGUITY_RATIO
+        return Resolution(
+            task_id=None if ambiguous else best[0],
+            score=best[2],
+            ambiguous=ambiguous,
+            candidates=candidates,
+        )
+
+
+def _load_titles():
+    from tasks.models import Task
+    return Task.objects.values_list('id', 'title').iterator()
+
+
+task_index = TaskTitleIndex(loader=_load_titles, max_age=settings.AI_TASK_INDEX_MAX_AGE_SECONDS)
@@ -1,3 +1,282 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from tasks.idempotency import IdempotencyService
+from tasks.models import Task
+from tasks.services import TaskService
+from .dispatcher import IntentDispatcher
+from .services import GroqService
+from .task_index import TaskTitleIndex, task_index
 
-# Create your tests here.
+TITLES = [
+    (1, "Prepare quarterly presentation"),
+    (2, "Team meeting with design"),
+    (3, "Buy milk"),
+    (4, "Email the landlord about rent"),
+    (5, "Fix login bug on mobile"),
+    (6, "Book dentist appointment"),
+    (7, "Review pull requests"),
+    (8, "Plan birthday party"),
+]
+
+# (LLM-extracted title, expected task id)
+LABELLED = [
+    ("presentation", 1),
+    ("the presentation", 1),
+    ("quarterly presentaton", 1),
+    ("the meeting one", 2),
+    ("design meeting", 2),
+    ("milk", 3),
+    ("landlord email", 4),
+    ("login bug", 5),
+    ("mobile login", 5),
+    ("dentist", 6),
+    ("dentist appt", 6),
+    ("review PRs", 7),
+    ("birthday", 8),
+    ("party planning", 8),
+]
+
+# Titles that share words with a task but mean something else; resolving
+# any of these to a task would act on the wrong one.
+UNRELATED = [
+    "quantum physics",
+    "buy bread",
+    "book flight to paris",
+    "email the plumber",
+    "fix the car",
+    "team lunch",
+    "review budget",
+    "plan trip",
+]
+
+
+class TaskTitleIndexTest(TestCase):
+    def setUp(self):
+        self.index = TaskTitleIndex()
+        self.index.rebuild(TITLES)
+
+    def test_beats_substring_matching_on_labelled_set(self):
+        def substring(query):
+            return next((i for i, t in TITLES if query.lower() in t.lower()), None)
+
+        fuzzy_hits = sum(self.index.resolve(q).task_id == expected for q, expected in LABELLED)
+        substring_hits = sum(substring(q) == expected for q, expected in LABELLED)
+        self.assertGreater(fuzzy_hits, substring_hits)
+        self.assertGreaterEqual(fuzzy_hits, len(LABELLED) - 2)
+
+    def test_unrelated_queries_below_threshold(self):
+        for query in UNRELATED:
+            with self.subTest(query=query):
+                self.assertIsNone(self.index.resolve(query).task_id)
+
+    def test_close_scores_are_ambiguous(self):
+        self.index.upsert(9, "Team meeting with sales")
+        resolution = self.index.resolve("team meeting")
+        self.assertTrue(resolution.ambiguous)
+        self.assertIsNone(resolution.task_id)
+        self.assertEqual({c[0] for c in resolution.candidates[:2]}, {2, 9})
+
+    def test_lookup_does_not_wait_for_load(self):
+        release = threading.Event()
+
+        def slow_loader():
+            release.wait(5)
+            return TITLES
+
+        index = TaskTitleIndex(loader=slow_loader)
+        started = time.monotonic()
+        self.assertEqual(index.search("milk"), [])
+        self.assertLess(time.monotonic() - started, 1)
+        index.upsert(10, "Walk the dog")  # Arrives mid-load, must not be lost
+        release.set()
+        for _ in range(100):
+            if index.search("milk"):
+                break
+            time.sleep(0.01)
+        self.assertEqual(index.resolve("milk").task_id, 3)
+        self.assertEqual(index.resolve("walk dog").task_id, 10)
+
+    def test_incremental_updates(self):
+        self.index.upsert(3, "Buy oat milk")
+        self.index.remove(6)
+        self.assertEqual(self.index.resolve("oat milk").task_id, 3)
+        self.assertIsNone(self.index.resolve("dentist").task_id)
+
+
+class IntentDispatcherFindTaskTest(TestCase):
+    def setUp(self):
+        task_index.reset()
+
+    def tearDown(self):
+        task_index.reset()
+
+    def test_resolves_fuzzy_title(self):
+        task = TaskService.create_task(title="Prepare quarterly presentation")
+        TaskService.create_task(title="Buy milk")
+        task_index.warm(background=False)
+        result = IntentDispatcher.handle_intent(
+            {"action": "update_task_status", "params": {"title": "the presentation", "status": "IN_PROGRESS"}}
+        )
+        self.assertTrue(result["success"])
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.Status.IN_PROGRESS)
+
+    def test_partly_matching_title_does_not_delete_other_task(self):
+        TaskService.create_task(title="Buy milk")
+        task_index.warm(background=False)
+        result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "buy bread"}})
+        self.assertFalse(result["success"])
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_rejected_title_does_not_fall_back_to_substring(self):
+        TaskService.create_task(title="Wholesale pricing review")
+        TaskService.create_task(title="Team meeting with design")
+        task_index.warm(background=False)
+        self.assertIsNone(task_index.resolve("sale").task_id)
+        result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "sale"}})
+        self.assertFalse(result["success"])
+        self.assertEqual(result["message"], "Task not found.")
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_substring_fallback_before_load_requires_single_match(self):
+        TaskService.create_task(title="Team meeting with design")
+        TaskService.create_task(title="Team meeting with sales")
+        with mock.patch.object(task_index, 'warm'):  # Keep the index unloaded
+            result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "meeting"}})
+            self.assertFalse(result["success"])
+            result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "sales"}})
+            self.assertTrue(result["success"])
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ["Team meeting with design"])
+
+    def test_reports_ambiguity(self):
+        TaskService.create_task(title="Team meeting with design")
+        TaskService.create_task(title="Team meeting with sales")
+        task_index.warm(background=False)
+        result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "team meeting"}})
+        self.assertFalse(result["success"])
+        self.assertIn("several tasks", result["message"])
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_title_renamed_elsewhere_is_not_acted_on(self):
+        task = TaskService.create_task(title="Buy milk")
+        task_index.warm(background=False)
+        # Simulates a rename by another worker: no signal reaches this index
+        Task.objects.filter(id=task.id).update(title="Call mom")
+        result = IntentDispatcher.handle_intent({"action": "delete_task", "params": {"title": "milk"}})
+        self.assertFalse(result["success"])
+        self.assertTrue(Task.objects.filter(id=task.id).exists())
+        self.assertEqual(task_index.resolve("call mom").task_id, task.id)
+
+    def test_index_follows_saves_and_deletes(self):
+        task_index.rebuild([])
+        with self.captureOnCommitCallbacks(execute=True):
+            task = TaskService.create_task(title="Renew passport")
+        self.assertEqual(task_index.resolve("passport").task_id, task.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        self.assertIsNone(task_index.resolve("passport").task_id)
+
+
+def fake_interpret(command):
+    if command == "gibberish":
+        return {"action": "unknown"}
+    if command == "fail":
+        return {"action": "error", "message": "Groq unavailable"}
+    return {"action": "create_task", "params": {"title": command}}
+
+
+class AIBatchCommandViewTest(TestCase):
+    def post_batch(self, commands, **headers):
+        return self.client.post(
+            '/api/ai/commands/batch/', {'commands': commands}, content_type='application/json', headers=headers,
+        )
+
+    @mock.patch.object(GroqService, 'interpret_command', side_effect=fake_interpret)
+    def test_partial_failure_reported_per_command(self, _):
+        response = self.post_batch(["Buy milk", "gibberish", "", "fail", "Walk dog"])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([r["success"] for r in body["results"]], [True, False, False, False, True])
+        self.assertEqual(body["results"][3]["error"], "Groq unavailable")
+        self.assertEqual(body["succeeded"], 2)
+        self.assertEqual(set(Task.objects.values_list('title', flat=True)), {"Buy milk", "Walk dog"})
+
+    def test_rejects_non_list(self):
+        self.assertEqual(self.post_batch("Buy milk").status_code, 400)
+
+    @override_settings(AI_BATCH_CONCURRENCY=4)
+    def test_interprets_concurrently_up_to_limit(self):
+        lock = threading.Lock()
+        in_flight = peak = 0
+
+        def slow_interpret(command):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return fake_interpret(command)
+
+        with mock.patch.object(GroqService, 'interpret_command', side_effect=slow_interpret):
+            response = self.post_batch([f"Task {i}" for i in range(12)])
+        self.assertEqual(response.json()["succeeded"], 12)
+        self.assertLessEqual(peak, 4)
+        self.assertGreater(peak, 1)
+
+    @override_settings(AI_BATCH_TRANSACTION_SIZE=2)
+    def test_retry_after_crash_skips_committed_groups(self):
+        commands = ["A", "B", "", "C", "D"]
+        real_checkpoint = IdempotencyService.checkpoint
+
+        def crash_in_second_group(request, progress):
+            if len(progress["results"]) > 2:
+                raise RuntimeError("worker died")
+            real_checkpoint(request, progress)
+
+        with mock.patch.object(GroqService, 'interpret_command', side_effect=fake_interpret), \
+                mock.patch.object(IdempotencyService, 'checkpoint', side_effect=crash_in_second_group):
+            with self.assertRaises(RuntimeError):
+                self.post_batch(commands, **{'Idempotency-Key': 'batch-1'})
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ["A", "B"])
+
+        with mock.patch.object(GroqService, 'interpret_command', side_effect=fake_interpret) as interpret:
+            response = self.post_batch(commands, **{'Idempotency-Key': 'batch-1'})
+        self.assertEqual(sorted(c.args[0] for c in interpret.call_args_list), ["C", "D"])
+        body = response.json()
+        self.assertEqual([r["success"] for r in body["results"]], [True, True, False, True, True])
+        self.assertEqual(body["succeeded"], 4)
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ["A", "B", "C", "D"])
+
+
+class AIBatchCommandTransactionTest(TransactionTestCase):
+    @override_settings(AI_BATCH_TRANSACTION_SIZE=2)
+    @mock.patch.object(GroqService, 'interpret_command', side_effect=fake_interpret)
+    def test_groups_commit_separately_with_idempotency_key(self, _):
+        real_interpret_commands = GroqService.interpret_commands.__func__
+        real_handle_intent = IntentDispatcher.handle_intent
+        interpreted_in_transaction = []
+        savepoint_depths = []
+
+        def interpret_commands(cls, *args, **kwargs):
+            interpreted_in_transaction.append(connection.in_atomic_block)
+            return real_interpret_commands(cls, *args, **kwargs)
+
+        def handle_intent(intent):
+            savepoint_depths.append(len(connection.savepoint_ids))
+            return real_handle_intent(intent)
+
+        with mock.patch.object(GroqService, 'interpret_commands', classmethod(interpret_commands)), \
+                mock.patch.object(IntentDispatcher, 'handle_intent', side_effect=handle_intent):
+            response = self.client.post(
+                '/api/ai/commands/batch/', {'commands': ["A", "B", "C"]}, content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='batch-1',
+            )
+        self.assertEqual(response.json()["succeeded"], 3)
+        self.assertEqual(interpreted_in_transaction, [False])
+        # Only the per-command savepoint: the group atomic is the outermost transaction
+        self.assertEqual(savepoint_depths, [1, 1, 1])
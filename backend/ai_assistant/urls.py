@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import AICommandView
+from .views import AIBatchCommandView, AICommandView
 
 urlpatterns = [
     path('command/', AICommandView.as_view(), name='ai-command'),
+    path('commands/batch/', AIBatchCommandView.as_view(), name='ai-command-batch'),
 ]
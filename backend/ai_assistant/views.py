@@ -1,10 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.db import transaction
 from .services import GroqService
 from .dispatcher import IntentDispatcher
+from tasks.idempotency import IdempotencyService, idempotent
 
 class AICommandView(APIView):
+    @idempotent
     def post(self, request):
         command = request.data.get('command')
         if not command:
@@ -30,11 +34,94 @@ class AICommandView(APIView):
             if intent.get('action') in ['unknown', None]:
                  return Response({"message": "I didn't understand that command.", "intent": intent}, status=status.HTTP_200_OK)
 
-        # 2. Dispatch to Business Logic
-        result = IntentDispatcher.handle_intent(intent)
-        
+        # 2. Dispatch to Business Logic. The Groq call above stays outside
+        #    the transaction; only the writes and the stored response share it.
+        with transaction.atomic():
+            result = IntentDispatcher.handle_intent(intent)
+            response = Response({
+                "original_command": command,
+                "interpreted_intent": intent,
+                "result": result
+            })
+            IdempotencyService.store(request, response)
+        return response
+
+
+class AIBatchCommandView(APIView):
+    """
+    Interprets a list of commands concurrently, then dispatches the intents in
+    grouped transactions. Each command gets its own result; one failing
+    command does not affect the others.
+
+    With an Idempotency-Key, each group saves its results in the same
+    transaction as its writes. A retry that takes over an interrupted batch
+    reuses those results and only runs the commands that never committed.
+    """
+
+    @idempotent
+    def post(self, request):
+        commands = request.data.get('commands')
+        if not isinstance(commands, list) or not commands:
+            return Response({"error": "commands must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(commands) > settings.AI_BATCH_MAX_COMMANDS:
+            return Response(
+                {"error": f"At most {settings.AI_BATCH_MAX_COMMANDS} commands per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Results committed by an earlier, interrupted run of this request
+        done = (IdempotencyService.progress(request) or {}).get("results", [])
+        results = [{"index": i, "command": c, "success": False} for i, c in enumerate(commands)]
+        for result in done:
+            results[result["index"]] = result
+        done_indexes = {r["index"] for r in done}
+        pending = []
+        for result in results:
+            if result["index"] in done_indexes:
+                continue
+            if isinstance(result["command"], str) and result["command"].strip():
+                pending.append(result)
+            else:
+                result["error"] = "Command is required"
+
+        # 1. Interpret concurrently, outside any transaction. Keep the
+        #    Idempotency-Key lock fresh so a retry cannot take over the batch.
+        intents = GroqService.interpret_commands(
+            [r["command"] for r in pending],
+            on_result=lambda: IdempotencyService.keep_alive(request),
+        )
+
+        # 2. Dispatch in groups, each its own transaction; each command gets
+        #    a savepoint so a failure only rolls back its own changes.
+        group_size = settings.AI_BATCH_TRANSACTION_SIZE
+        for start in range(0, len(pending), group_size):
+            IdempotencyService.keep_alive(request)
+            group = pending[start:start + group_size]
+            with transaction.atomic():
+                for result, intent in zip(group, intents[start:start + group_size]):
+                    result["interpreted_intent"] = intent
+                    action = intent.get('action')
+                    if action == 'error':
+                        result["error"] = intent.get('message')
+                        continue
+                    if action in ['unknown', None]:
+                        result["error"] = "I didn't understand that command."
+                        continue
+                    try:
+                        with transaction.atomic():
+                            outcome = IntentDispatcher.handle_intent(intent)
+                    except Exception as e:
+                        result["error"] = str(e)
+                        continue
+                    result["result"] = outcome
+                    result["success"] = bool(outcome.get("success"))
+                # Commits with the group's writes, or not at all
+                IdempotencyService.checkpoint(request, {"results": done + pending[:start + len(group)]})
+
+        succeeded = sum(r["success"] for r in results)
         return Response({
-            "original_command": command,
-            "interpreted_intent": intent,
-            "result": result
+            "message": f"Processed {len(results)} commands. {succeeded} succeeded.",
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
         })
@@ -0,0 +1,108 @@
+import secrets
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+
+# Per-thread routing state. Reset by ReplicaRoutingMiddleware at the start and
+# end of every request so nothing leaks between requests served by one worker.
+_state = threading.local()
+
+STICKY_CACHE_PREFIX = 'db-primary-pin:'
+# The server hands each writing client a token in this header; the client
+# sends it back so its pin does not leak to others sharing its IP address.
+PIN_HEADER = 'X-Replica-Pin'
+
+
+def replica_alias():
+    """Returns the configured replica alias, or None when no replica is set up."""
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Marks the reads inside the block as safe to serve from the replica.
+    Ignored when the current request is pinned to the primary.
+    """
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+def pin_to_primary():
+    _state.pinned = True
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+def reset_routing():
+    _state.use_replica = False
+    _state.pinned = False
+    _state.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends opted-in reads to the replica and everything else to the primary.
+
+    Once a write happens, the rest of the request reads from the primary so
+    callers always see their own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if not alias or not getattr(_state, 'use_replica', False):
+            return None
+        if getattr(_state, 'pinned', False) or has_written():
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data.
+        return True
+
+
+def pin_token(request):
+    """Returns the pin token the client echoed back, if any."""
+    return request.headers.get(PIN_HEADER, '')[:64]
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Keeps a client on the primary for a short window after it writes, so
+    replication lag does not hide the change from its next request.
+
+    After a write the response carries a PIN_HEADER token, and the window
+    is recorded in the cache under that token. Clients that send the token
+    back are pinned; a client that never echoes it only gets read-after-write
+    within a single request. With several worker processes, CACHES must
+    point at a shared backend for the pin to be seen by every worker.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_routing()
+        token = pin_token(request)
+        if replica_alias() and token and cache.get(STICKY_CACHE_PREFIX + token):
+            pin_to_primary()
+        try:
+            response = self.get_response(request)
+            if has_written() and replica_alias():
+                token = token or secrets.token_urlsafe(16)
+                cache.set(STICKY_CACHE_PREFIX + token, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+                response[PIN_HEADER] = token
+            return response
+        finally:
+            reset_routing()
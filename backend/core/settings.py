@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 
@@ -58,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -90,8 +92,30 @@ DATABASES = {
     }
 }
 
+# Optional read replica. Task list/retrieve reads go here; writes and any read
+# after a write in the same request stay on 'default'.
+# Locally, point DATABASE_REPLICA_NAME at a second SQLite file.
+DATABASE_REPLICA_ALIAS = None
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': os.environ.get('DATABASE_REPLICA_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'USER': os.environ.get('DATABASE_REPLICA_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_REPLICA_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_REPLICA_HOST', ''),
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', ''),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICA_ALIAS = 'replica'
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-replica-pin')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'X-Replica-Pin']
 
 # DRF
 REST_FRAMEWORK = {
@@ -101,6 +125,20 @@ REST_FRAMEWORK = {
 }
 
 
+# Idempotency-Key handling for task creation and AI commands
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', 60))
+
+# Batch AI commands (/api/ai/commands/batch/)
+AI_BATCH_MAX_COMMANDS = int(os.environ.get('AI_BATCH_MAX_COMMANDS', 500))
+AI_BATCH_CONCURRENCY = int(os.environ.get('AI_BATCH_CONCURRENCY', 8))
+AI_BATCH_TRANSACTION_SIZE = int(os.environ.get('AI_BATCH_TRANSACTION_SIZE', 50))
+
+# In-memory task title index used to resolve AI titles; reloaded from the
+# database this often to pick up changes made by other worker processes.
+AI_TASK_INDEX_MAX_AGE_SECONDS = int(os.environ.get('AI_TASK_INDEX_MAX_AGE_SECONDS', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,89 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils.connection import ConnectionDoesNotExist
+from ai_assistant.dispatcher import IntentDispatcher
+from tasks.models import Task
+from .db_router import (
+    PIN_HEADER, PrimaryReplicaRouter, pin_to_primary, read_from_replica, reset_routing,
+)
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica')
+class PrimaryReplicaRouterTest(TestCase):
+    def setUp(self):
+        reset_routing()
+        self.router = PrimaryReplicaRouter()
+
+    def tearDown(self):
+        reset_routing()
+
+    def test_reads_default_to_primary(self):
+        self.assertIsNone(self.router.db_for_read(Task))
+
+    def test_opted_in_reads_use_replica(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Task), 'replica')
+
+    def test_writes_go_to_primary_and_pin_reads(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Task), 'default')
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_pinned_request_reads_primary(self):
+        pin_to_primary()
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    @override_settings(DATABASE_REPLICA_ALIAS=None)
+    def test_no_replica_configured(self):
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Task))
+
+    def test_list_tasks_intent_reads_from_replica(self):
+        real_db_for_read = PrimaryReplicaRouter.db_for_read
+        chosen = []
+
+        def record_choice(router, model, **hints):
+            chosen.append(real_db_for_read(router, model, **hints))
+            return None  # Run the query on 'default'; no replica exists in tests
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', autospec=True, side_effect=record_choice):
+            result = IntentDispatcher.handle_intent({"action": "list_tasks", "params": {}})
+        self.assertTrue(result["success"])
+        self.assertTrue(chosen)
+        self.assertEqual(set(chosen), {'replica'})
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica')
+class ReplicaRoutingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_task(self, **headers):
+        return self.client.post('/api/tasks/', {'title': 'Sticky'}, content_type='application/json', headers=headers)
+
+    def test_write_returns_pin_token(self):
+        response = self.create_task()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response[PIN_HEADER])
+        # No cookies involved: the browser client does not send them cross-origin.
+        self.assertEqual(len(response.cookies), 0)
+
+    def test_client_echoing_token_reads_primary(self):
+        token = self.create_task()[PIN_HEADER]
+        # No 'replica' connection exists in tests, so this only passes if the
+        # list read is served by the primary.
+        response = self.client.get('/api/tasks/', headers={PIN_HEADER: token})
+        self.assertEqual(response.status_code, 200)
+        # The same token is kept for the client's next write
+        self.assertEqual(self.create_task(**{PIN_HEADER: token})[PIN_HEADER], token)
+
+    def test_clients_sharing_an_address_are_pinned_independently(self):
+        # Both test-client requests come from 127.0.0.1
+        self.create_task()
+        # Unpinned reads are routed to the (missing) replica connection.
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get('/api/tasks/')
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get('/api/tasks/', headers={PIN_HEADER: 'someone-else'})
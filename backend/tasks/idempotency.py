@@ -0,0 +1,241 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+class IdempotencyLockLost(Exception):
+    """Another request took over this request's Idempotency-Key."""
+
+
+class IdempotencyService:
+    @staticmethod
+    def request_hash(request) -> str:
+        data = request.data
+        if hasattr(data, 'dict'):
+            data = data.dict()
+        payload = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def claim(key: str, request_hash: str):
+        """
+        Tries to take ownership of a key.
+
+        Returns (record, claimed). claimed is False when another request owns
+        the key: either it already finished (replay its response) or it is
+        still running.
+        """
+        while True:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyRecord.objects.create(
+                        key=key,
+                        request_hash=request_hash,
+                        locked_at=now,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+                    )
+                    return record, True
+            except IntegrityError:
+                pass
+            try:
+                record = IdempotencyRecord.objects.get(key=key)
+                break
+            except IdempotencyRecord.DoesNotExist:
+                continue  # Released by its owner in the meantime; try again
+
+        # A lock with no owner (locked_at None) was released with progress
+        # saved; see release().
+        abandoned = record.response_status is None and (
+            record.locked_at is None
+            or record.locked_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+        )
+        if record.expires_at < now or abandoned:
+            # Take over an expired key or an abandoned lock. The conditional
+            # update makes sure only one concurrent retry wins. A retry of
+            # the same request keeps the progress the abandoned one saved.
+            resume = abandoned and record.expires_at >= now and record.request_hash == request_hash
+            taken = IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+                request_hash=request_hash,
+                response_status=None,
+                response_body=record.response_body if resume else None,
+                locked_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            )
+            if taken:
+                record.refresh_from_db()
+                return record, True
+            record.refresh_from_db()
+        return record, False
+
+    @staticmethod
+    def complete(record: IdempotencyRecord, response: Response):
+        updated = IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+            response_status=response.status_code,
+            response_body=response.data,
+            locked_at=None,
+        )
+        if not updated:
+            raise IdempotencyLockLost(record.key)
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.locked_at = None
+
+    @staticmethod
+    def keep_alive(request):
+        """
+        Refreshes the request's key lock so a long request (e.g. a large batch)
+        is not mistaken for an abandoned one and taken over by a retry.
+        Writes at most every quarter of the lock timeout.
+        """
+        record = getattr(request, 'idempotency_record', None)
+        if record is None or record.response_status is not None:
+            return
+        now = timezone.now()
+        if now - record.locked_at < timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS / 4):
+            return
+        updated = IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).update(locked_at=now)
+        if not updated:
+            raise IdempotencyLockLost(record.key)
+        record.locked_at = now
+
+    @staticmethod
+    def progress(request):
+        """Returns the progress saved by checkpoint() for the request's key, if any."""
+        record = getattr(request, 'idempotency_record', None)
+        if record is None or record.response_status is not None:
+            return None
+        return record.response_body
+
+    @staticmethod
+    def checkpoint(request, progress):
+        """
+        Saves partial progress for the request's Idempotency-Key, so a retry
+        that takes over the key can skip the work already done.
+
+        Call this inside the transaction whose writes the progress describes.
+        If another request took the key over, raises IdempotencyLockLost so
+        those writes roll back instead of being repeated by the new owner.
+        """
+        record = getattr(request, 'idempotency_record', None)
+        if record is None:
+            return
+        now = timezone.now()
+        updated = IdempotencyRecord.objects.filter(
+            pk=record.pk, locked_at=record.locked_at, response_status__isnull=True
+        ).update(response_body=progress, locked_at=now)
+        if not updated:
+            raise IdempotencyLockLost(record.key)
+        record.response_body = progress
+        record.locked_at = now
+
+    @staticmethod
+    def store(request, response: Response):
+        """
+        Saves the response for the request's Idempotency-Key, if it has one.
+
+        Call this inside the same transaction as the request's writes, so the
+        writes and the replayable response commit together.
+        """
+        record = getattr(request, 'idempotency_record', None)
+        if record is not None and record.response_status is None and response.status_code < 500:
+            IdempotencyService.complete(record, response)
+
+    @staticmethod
+    def release(record: IdempotencyRecord):
+        """
+        Lets a retry run a failed request again. A key with saved progress is
+        only unlocked, so the retry resumes instead of redoing committed work.
+        """
+        owned = IdempotencyRecord.objects.filter(
+            pk=record.pk, locked_at=record.locked_at, response_status__isnull=True
+        )
+        owned.filter(response_body__isnull=False).update(locked_at=None)
+        owned.filter(response_body__isnull=True).delete()
+
+    @staticmethod
+    def purge_expired(batch_size: int = 1000) -> int:
+        """Deletes expired keys in batches to keep each transaction short."""
+        deleted = 0
+        while True:
+            ids = list(
+                IdempotencyRecord.objects.filter(expires_at__lt=timezone.now())
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += IdempotencyRecord.objects.filter(id__in=ids).delete()[0]
+
+
+def idempotent(view_method):
+    """
+    Makes a DRF view method honor the Idempotency-Key header.
+
+    The first request with a key runs normally and its response is stored.
+    Retries with the same key and payload get the stored response back
+    without re-running the view. Server errors are not stored, so they can
+    be retried.
+
+    The decorator opens no transaction. Views that write should call
+    IdempotencyService.store() inside the atomic block around their writes;
+    responses they return without storing (e.g. validation errors) are
+    stored here afterwards. Long-running views should call
+    IdempotencyService.keep_alive() as they make progress, and views that
+    commit in several transactions should save what each one did with
+    IdempotencyService.checkpoint().
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        request_hash = IdempotencyService.request_hash(request)
+        record, claimed = IdempotencyService.claim(key, request_hash)
+
+        if not claimed:
+            if record.request_hash != request_hash:
+                return Response(
+                    {"error": f"{HEADER} was already used with a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.response_status is None:
+                return Response(
+                    {"error": "A request with this Idempotency-Key is still in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            response = Response(record.response_body, status=record.response_status)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        request.idempotency_record = record
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            IdempotencyService.store(request, response)
+        except IdempotencyLockLost:
+            # The key now belongs to another request; leave its record alone.
+            return Response(
+                {"error": "A request with this Idempotency-Key is still in progress"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except Exception:
+            IdempotencyService.release(record)
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyService.release(record)
+        return response
+
+    return wrapper
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from tasks.idempotency import IdempotencyService
+
+
+class Command(BaseCommand):
+    help = "Deletes expired Idempotency-Key records in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyService.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(f"Purged {deleted} expired idempotency keys.")
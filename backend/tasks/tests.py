@@ -1,6 +1,10 @@
+from datetime import timedelta
+from unittest import mock
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from .models import Task
+from django.utils import timezone
+from .idempotency import IdempotencyLockLost, IdempotencyService
+from .models import IdempotencyRecord, Task
 from .services import TaskService
 
 class TaskServiceTest(TestCase):
@@ -37,3 +41,126 @@ class TaskServiceTest(TestCase):
         TaskService.update_status(task, Task.Status.COMPLETED)
         with self.assertRaises(ValidationError):
             TaskService.update_status(task, Task.Status.IN_PROGRESS)
+
+
+class IdempotencyKeyTest(TestCase):
+    def post_task(self, key, title="Retry me"):
+        return self.client.post(
+            '/api/tasks/', {'title': title}, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_original_response(self):
+        first = self.post_task('abc')
+        second = self.post_task('abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_without_key_creates_each_time(self):
+        self.client.post('/api/tasks/', {'title': 'A'}, content_type='application/json')
+        self.client.post('/api/tasks/', {'title': 'A'}, content_type='application/json')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_key_reused_with_different_payload(self):
+        self.post_task('abc', title="One")
+        response = self.post_task('abc', title="Two")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_in_progress_duplicate_is_rejected(self):
+        self.post_task('abc')
+        record = IdempotencyRecord.objects.get(key='abc')
+        record.response_status = None
+        record.locked_at = timezone.now()
+        record.save()
+        response = self.post_task('abc')
+        self.assertEqual(response.status_code, 409)
+
+    def test_key_released_during_claim_is_claimed_again(self):
+        IdempotencyRecord.objects.create(key='abc', request_hash='x', expires_at=timezone.now())
+        real_get = IdempotencyRecord.objects.get
+
+        def released_then_get(**kwargs):
+            # The owner releases the key between our failed insert and lookup
+            IdempotencyRecord.objects.filter(key='abc').delete()
+            get.side_effect = real_get
+            raise IdempotencyRecord.DoesNotExist
+
+        with mock.patch.object(IdempotencyRecord.objects, 'get', side_effect=released_then_get) as get:
+            response = self.post_task('abc')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_ai_command_retry_does_not_call_groq_again(self):
+        from ai_assistant.services import GroqService
+        intent = {"action": "create_task", "params": {"title": "Buy milk"}}
+        with mock.patch.object(GroqService, 'interpret_command', return_value=intent) as interpret:
+            responses = [
+                self.client.post(
+                    '/api/ai/command/', {'command': 'add buy milk'}, content_type='application/json',
+                    HTTP_IDEMPOTENCY_KEY='ai-1',
+                )
+                for _ in range(2)
+            ]
+        self.assertEqual(interpret.call_count, 1)
+        self.assertEqual(responses[0].json(), responses[1].json())
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_lock_taken_over_mid_request_rolls_back(self):
+        real_create = TaskService.create_task
+
+        def create_after_takeover(**kwargs):
+            # A retry decided this request was abandoned and took the key over
+            IdempotencyRecord.objects.filter(key='abc').update(locked_at=timezone.now() + timedelta(seconds=1))
+            return real_create(**kwargs)
+
+        with mock.patch.object(TaskService, 'create_task', side_effect=create_after_takeover):
+            response = self.post_task('abc')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Task.objects.count(), 0)
+        self.assertTrue(IdempotencyRecord.objects.filter(key='abc', response_status__isnull=True).exists())
+
+    def test_keep_alive_refreshes_lock(self):
+        stale = timezone.now() - timedelta(seconds=50)
+        record = IdempotencyRecord.objects.create(
+            key='abc', request_hash='x', locked_at=stale, expires_at=timezone.now() + timedelta(days=1),
+        )
+        request = mock.Mock(idempotency_record=record)
+        IdempotencyService.keep_alive(request)
+        record.refresh_from_db()
+        self.assertGreater(record.locked_at, stale)
+
+        IdempotencyRecord.objects.update(locked_at=stale)  # Taken over by someone else
+        record.locked_at = timezone.now() - timedelta(seconds=50)
+        with self.assertRaises(IdempotencyLockLost):
+            IdempotencyService.keep_alive(request)
+
+    def test_takeover_keeps_progress_only_for_same_request(self):
+        stale = timezone.now() - timedelta(seconds=120)
+        expires = timezone.now() + timedelta(days=1)
+        IdempotencyRecord.objects.create(
+            key='same', request_hash='x', response_body={'results': [1]}, locked_at=stale, expires_at=expires,
+        )
+        IdempotencyRecord.objects.create(
+            key='other', request_hash='y', response_body={'results': [1]}, locked_at=stale, expires_at=expires,
+        )
+        record, claimed = IdempotencyService.claim('same', 'x')
+        self.assertTrue(claimed)
+        self.assertEqual(record.response_body, {'results': [1]})
+        record, claimed = IdempotencyService.claim('other', 'x')
+        self.assertTrue(claimed)
+        self.assertIsNone(record.response_body)
+
+    def test_expired_key_runs_again_and_purge(self):
+        self.post_task('abc')
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post_task('abc').status_code, 201)
+        self.assertEqual(Task.objects.count(), 2)
+
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(IdempotencyService.purge_expired(batch_size=1), 1)
+        self.assertFalse(IdempotencyRecord.objects.exists())
@@ -2,9 +2,12 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from core.db_router import read_from_replica
 from .models import Task
 from .serializers import TaskSerializer
 from .services import TaskService
+from .idempotency import IdempotencyService, idempotent
 
 class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all().order_by('-created_at')
@@ -17,19 +20,28 @@ class TaskViewSet(viewsets.ModelViewSet):
         if status_param:
             queryset = queryset.filter(status=status_param)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        with read_from_replica():
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
 
+    def retrieve(self, request, *args, **kwargs):
+        with read_from_replica():
+            return super().retrieve(request, *args, **kwargs)
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         try:
-            task = TaskService.create_task(
-                title=serializer.validated_data['title'],
-                description=serializer.validated_data.get('description')
-            )
-            return Response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                task = TaskService.create_task(
+                    title=serializer.validated_data['title'],
+                    description=serializer.validated_data.get('description')
+                )
+                response = Response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
+                IdempotencyService.store(request, response)
+            return response
         except ValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -65,5 +77,6 @@ class TaskViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Status parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         tasks = self.queryset.filter(status=status_param)
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        with read_from_replica():
+            serializer = self.get_serializer(tasks, many=True)
+            return Response(serializer.data)
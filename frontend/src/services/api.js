@@ -5,6 +5,25 @@ const api = axios.create({
     baseURL: 'http://localhost:8000/api',
 });
 
+// After a write the backend returns a pin token; sending it back keeps our
+// next reads on the primary database so we see our own changes.
+let replicaPin = null;
+
+api.interceptors.request.use((config) => {
+    if (replicaPin) {
+        config.headers['X-Replica-Pin'] = replicaPin;
+    }
+    return config;
+});
+
+api.interceptors.response.use((response) => {
+    const pin = response.headers['x-replica-pin'];
+    if (pin) {
+        replicaPin = pin;
+    }
+    return response;
+});
+
 export const getTasks = async (status) => {
     const params = status ? { status } : {};
     const response = await api.get('/tasks/', { params });